@@ -1,11 +1,61 @@
 # Adapted from: https://gist.github.com/klipstein/709890
 
-import base64
+try:
+    import pybase64 as base64  # SIMD-accelerated, API compatible with the stdlib module
+except ImportError:
+    import base64
 import mimetypes
+import mmap
 import os
 from tastypie.fields import FileField
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db.models.fields.files import FieldFile
+
+# files larger than this are referenced by URL rather than inlined
+MAX_INLINE_SIZE = 1 << 20
+# content types of the formats HydroShare serves most; anything else falls back to mimetypes
+CONTENT_TYPES = {
+    '.csv': 'text/csv',
+    '.txt': 'text/plain',
+    '.xml': 'application/xml',
+    '.json': 'application/json',
+    '.zip': 'application/zip',
+    '.nc': 'application/x-netcdf',
+    '.h5': 'application/x-hdf',
+    '.hdf': 'application/x-hdf',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.pdf': 'application/pdf',
+}
+
+
+def guess_content_type(filename):
+    content_type = CONTENT_TYPES.get(os.path.splitext(filename)[1].lower())
+    return content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def b64encode_file(path):
+    """
+    Base64 encode the file at path in one pass over a memory map of it, so that the encoded output is the only copy
+    of the contents held in memory.
+
+    Parameters:
+    :param path: (str) The file to encode
+
+    :return: (str) The base64 encoded contents of the file
+    """
+    with open(path, "rb") as fh:
+        if not os.fstat(fh.fileno()).st_size:
+            return b""  # empty files cannot be mapped
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return base64.b64encode(mm)
+        finally:
+            mm.close()
+
  
 class Base64FileField(FileField):
     """
@@ -28,19 +78,38 @@ class Base64FileField(FileField):
         "file": "longbas64encodedstring",
         "content_type": "image/png" # on hydrate optional
     }
+
+    Files larger than max_inline_size bytes (default MAX_INLINE_SIZE) are not
+    inlined on dehydrate. Their "file" is replaced by the file's storage URL:
+
+    file_field = {
+        "name": "mylargefile.nc",
+        "url": "/media/.../mylargefile.nc",
+        "content-type": "application/x-netcdf"
+    }
+
+    On hydrate, a structure without "file" (such as the above sent back
+    unchanged) leaves the stored file as it is.
     """
+    def __init__(self, *args, **kwargs):
+        self.max_inline_size = kwargs.pop('max_inline_size', MAX_INLINE_SIZE)
+        super(Base64FileField, self).__init__(*args, **kwargs)
+
     def dehydrate(self, bundle, for_list=True):
         if not bundle.data.has_key(self.instance_name) and hasattr(bundle.obj, self.instance_name):
             file_field = getattr(bundle.obj, self.instance_name)
             if file_field:
                 try:
-                    content_type, encoding = mimetypes.guess_type(file_field.file.name)
-                    b64 = open(file_field.file.name, "rb").read().encode("base64")
+                    # use the storage path rather than file_field.file, which opens a handle that is never closed
+                    path = file_field.path
                     ret = {
-                        "name": os.path.basename(file_field.file.name),
-                        "file": b64,
-                        "content-type": content_type or "application/octet-stream"
+                        "name": os.path.basename(path),
+                        "content-type": guess_content_type(path)
                     }
+                    if os.path.getsize(path) > self.max_inline_size:
+                        ret["url"] = file_field.url
+                    else:
+                        ret["file"] = b64encode_file(path)
                     return ret
                 except:
                     pass
@@ -52,6 +121,9 @@ class Base64FileField(FileField):
         # uploaded (i.e. during a PUT that doesn't modify the file).
         # Only try to hydrate if value is a dict (i.e. came from a JSON object)
         if not isinstance(value, FieldFile) and isinstance(value, dict):
+            if "file" not in value:
+                # a reference to the file already stored (see max_inline_size); nothing was uploaded
+                return getattr(obj.obj, self.instance_name)
             value = SimpleUploadedFile(value["name"], base64.b64decode(value["file"]), 
                                        getattr(value, "content_type", "application/octet-stream"))
         return value
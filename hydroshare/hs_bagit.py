@@ -1,86 +1,254 @@
 import arrow
-import bagit
+from datetime import date
 from django.core.files import File
+import errno
+import hashlib
+import json
+import mmap
 import os
-import shutil
+import sys
+import tempfile
 from hs_core.models import Bags
 from mezzanine.conf import settings
-import importlib
+from . import utils
 import zipfile
 
+try:
+    import orjson
+except ImportError:  # Python 2
+    orjson = None
+
+try:
+    from scandir import walk  # Python 2 backport of the scandir-based os.walk; saves a stat per entry
+except ImportError:
+    from os import walk  # scandir based since Python 3.5
+
+BAGIT_VERSION = '0.97'
+# allowZip64 is off by default on Python 2, which caps archives at 2 GiB
+ZIP_OPTIONS = {'allowZip64': True}
+if sys.version_info >= (3, 8):
+    # deflate level 1 is several times faster than the default 6 for a few percent in size on mixed payloads
+    ZIP_OPTIONS.update(compresslevel=1, strict_timestamps=False)
+CHUNK_SIZE = 1 << 20  # bytes per read when copying files
+
+# formats that are already compressed; deflating them again costs CPU and saves next to nothing
+PRECOMPRESSED_EXTENSIONS = frozenset((
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+    '.jpg', '.jpeg', '.png', '.gif', '.tif', '.tiff',
+    '.nc', '.h5', '.hdf', '.hdf5',
+    '.mp3', '.mp4', '.avi', '.mov',
+))
+
+
+def compress_type(filename):
+    """Pick the zip compression method for a file: stored if it is already compressed, otherwise deflated."""
+    if os.path.splitext(filename)[1].lower() in PRECOMPRESSED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
 def make_zipfile(output_filename, source_dir):
     """
     Create a zipfile recursively from a source directory, saving the relative path of all objects.
 
+    create_bag no longer stages bags on disk (see write_bag), but this is kept for callers zipping up a directory.
+
     Parameters:
     :param output_filename: (str) The output filename
     :param source_dir: (str) The source directory to zip
     """
     relroot = os.path.abspath(os.path.join(source_dir, os.pardir))
-    with zipfile.ZipFile(output_filename, "w", zipfile.ZIP_DEFLATED) as zip:
-        for root, dirs, files in os.walk(source_dir):
+    with zipfile.ZipFile(output_filename, "w", zipfile.ZIP_DEFLATED, **ZIP_OPTIONS) as zip:
+        for root, dirs, files in walk(source_dir):
+            rel = os.path.relpath(root, relroot)
             # add directory (needed for empty dirs)
-            zip.write(root, os.path.relpath(root, relroot))
+            zip.write(root, rel)
             for file in files:
                 filename = os.path.join(root, file)
-                if os.path.isfile(filename): # regular files only
-                    arcname = os.path.join(os.path.relpath(root, relroot), file)
-                    zip.write(filename, arcname)
+                zip.write(filename, os.path.join(rel, file), compress_type(filename))
+
+
+def write_bag(zip, bag_dir, payload, bag_info):
+    """
+    Write a BagIt bag directly into an open zipfile, without staging it on disk first.
+
+    Payload files are read once from where they already live and the tag files (bagit.txt, bag-info.txt and the md5
+    manifests) are generated in memory.
+
+    Parameters:
+    :param zip: (zipfile.ZipFile) An archive open for writing
+    :param bag_dir: (str) The bag's root directory within the archive
+    :param payload: (list of (str, str or None, str or None)) (name, path, data) triples, name being relative to the
+        bag's data directory.  Exactly one of path (a file on disk) or data (the file's bytes) should be given.
+    :param bag_info: (dict) Extra fields for bag-info.txt
+    """
+    manifest = []
+    octets = 0
+    for name, path, data in payload:
+        arcname = 'data/' + name
+        if path is not None:
+            octets += os.path.getsize(path)
+            zip.write(path, bag_dir + '/' + arcname, compress_type(path))
+            checksum = _md5sum(path)
+        else:
+            data = _to_bytes(data)
+            octets += len(data)
+            zip.writestr(bag_dir + '/' + arcname, data)
+            checksum = hashlib.md5(data).hexdigest()
+        manifest.append('{0}  {1}\n'.format(checksum, arcname))
+
+    bag_info = dict(bag_info)
+    bag_info.setdefault('Bagging-Date', date.today().strftime('%Y-%m-%d'))
+    bag_info['Payload-Oxum'] = '{0}.{1}'.format(octets, len(payload))
+
+    tag_files = [
+        ('bagit.txt', 'BagIt-Version: {0}\nTag-File-Character-Encoding: UTF-8\n'.format(BAGIT_VERSION)),
+        ('bag-info.txt', u''.join(u'{0}: {1}\n'.format(k, bag_info[k]) for k in sorted(bag_info))),
+        ('manifest-md5.txt', ''.join(manifest)),
+    ]
+    tag_manifest = []
+    for name, data in tag_files:
+        data = _to_bytes(data)
+        zip.writestr(bag_dir + '/' + name, data)
+        tag_manifest.append('{0}  {1}\n'.format(hashlib.md5(data).hexdigest(), name))
+    zip.writestr(bag_dir + '/tagmanifest-md5.txt', ''.join(tag_manifest))
+
+
+def _md5sum(path):
+    """md5 a file in one call into OpenSSL, rather than a Python loop over chunks."""
+    with open(path, 'rb') as f:
+        file_digest = getattr(hashlib, 'file_digest', None)  # Python 3.11+
+        if file_digest is not None:
+            return file_digest(f, 'md5').hexdigest()
+        if not os.fstat(f.fileno()).st_size:
+            return hashlib.md5().hexdigest()  # empty files cannot be mapped
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return hashlib.md5(mm).hexdigest()
+        finally:
+            mm.close()
+
+
+def dumps(data):
+    """Serialize already simplified (JSON-native) data, using orjson where it is available."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    # no sort_keys: on Python 2 it forces the pure-Python encoder
+    return json.dumps(data, ensure_ascii=False)
+
+
+class _TemporaryFile(File):
+    """
+    A file that may be consumed by its storage backend. FileSystemStorage moves files that have a
+    temporary_file_path() into place rather than copying their contents, the same as it does for large uploads.
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def _storage_mode():
+    """
+    The mode storage gives the files it writes: FILE_UPLOAD_PERMISSIONS, or 0666 less the umask when that isn't set.
+    """
+    mode = getattr(settings, 'FILE_UPLOAD_PERMISSIONS', None)
+    if mode is None:
+        umask = os.umask(0)  # the only way to read the umask is to set it
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    return mode
+
+
+def _to_bytes(s):
+    return s if isinstance(s, bytes) else s.encode('utf-8')
+
+
+def _write_dir(zip, arcname):
+    """Add an (empty) directory entry to an open zipfile."""
+    info = zipfile.ZipInfo(arcname.rstrip('/') + '/')
+    info.external_attr = (0o40755 << 16) | 0x10  # unix mode drwxr-xr-x plus the MS-DOS directory flag
+    zip.writestr(info, b'')
+
+
+def _payload_names(paths, prefix):
+    """Pair each path with a unique name under prefix. Files that share a basename are given a numeric suffix."""
+    taken = set()
+    for path in paths:
+        name = os.path.basename(path)
+        base, ext = os.path.splitext(name)
+        n = 1
+        while name in taken:
+            name = '{base}_{n}{ext}'.format(base=base, n=n, ext=ext)
+            n += 1
+        taken.add(name)
+        yield prefix + name, path
+
 
 def create_bag(resource):
     """
     Create a bag from the current filesystem of the resource, then zip it up and add it to the resource.
 
-    Note, this procedure may take awhile.  It is highly advised that it be deferred to a Celery task.
+    The bag is streamed straight into the zip: resource files are read from where they are stored and no staging copy
+    of the bag is ever made on disk.
+
+    Note, this procedure may take awhile.  It is highly advised that it be deferred to a Celery task, see
+    hs_core.tasks.create_bag.  If a bag already exists for the resource's current version it is returned as is.  This
+    is not a lock: concurrent calls for the same version each build their own archive, in their own temporary file.
 
     Parameters:
     :param resource: (subclass of AbstractResource) A resource to create a bag for.
 
     :return: the hs_core.models.Bags instance associated with the new bag.
     """
+    existing = resource.bags.filter(timestamp=resource.updated).first()
+    if existing:
+        return existing
+
     dest_prefix = getattr(settings, 'BAGIT_TEMP_LOCATION', '/tmp/hydroshare/')
-    bagit_path = os.path.join(dest_prefix, resource.short_id, arrow.get(resource.updated).format("YYYY.MM.DD.HH.mm.ss"))
-    visualization_path = os.path.join(bagit_path, 'visualization')
-    contents_path = os.path.join(bagit_path, 'contents')
+    try:
+        os.makedirs(dest_prefix)
+    except OSError as e:
+        if e.errno != errno.EEXIST:  # os.makedirs(..., exist_ok=True) on Python 3
+            raise
 
-    for d in (dest_prefix, bagit_path, visualization_path, contents_path):
-        try:
-            os.makedirs(d)
-        except:
-            shutil.rmtree(d)
-            os.makedirs(d)
-
-    for f in resource.files.all():
-        shutil.copy2(f.resource_file.path, contents_path)
-
-    with open(bagit_path + '/resourcemetadata.json', 'w') as out:
-        tastypie_module = resource._meta.app_label + '.api'        # the module name should follow this convention
-        tastypie_name = resource._meta.object_name + 'Resource'    # the classname of the Resource seralizer
-        tastypie_api = importlib.import_module(tastypie_module)    # import the module
-        serializer = getattr(tastypie_api, tastypie_name)()        # make an instance of the tastypie resource
-        bundle = serializer.build_bundle(obj=resource)             # build a serializable bundle out of the resource
-        out.write(serializer.serialize(None, serializer.full_dehydrate(bundle), 'application/json'))
-
-    bagit.make_bag(bagit_path, checksum=['md5'], bag_info={
-        'title': resource.title,
-        'author': resource.owners.all()[0].username,
-        'author_email': resource.owners.all()[0].email,
-        'version': arrow.get(resource.updated).format("YYYY.MM.DD.HH.mm.ss"),
-        'resource_type': '.'.join((resource._meta.app_label, resource._meta.object_name)),
-        'hydroshare_version': getattr(settings, 'HYDROSHARE_VERSION', "R1 development"),
-        'shortkey': resource.short_id,
-        'slug': resource.slug
-    })
-
-    zf = os.path.join(dest_prefix, resource.short_id) + ".zip"
-    make_zipfile(output_filename=zf, source_dir=bagit_path)
-    b = Bags.objects.create(
-        content_object=resource,
-        bag=File(open(zf)),
-        timestamp=resource.updated
+    serializer = utils.get_serializer(resource)
+    bundle = serializer.build_bundle(obj=resource)             # build a serializable bundle out of the resource
+    metadata = dumps(serializer._meta.serializer.to_simple(serializer.full_dehydrate(bundle), {}))
+
+    payload = [('resourcemetadata.json', None, metadata)]
+    payload.extend(
+        (name, path, None)
+        for name, path in _payload_names([f.resource_file.path for f in resource.files.all()], 'contents/')
     )
 
-    os.unlink(zf)
-    shutil.rmtree(bagit_path)
+    version = arrow.get(resource.updated).format("YYYY.MM.DD.HH.mm.ss")
+    owner = resource.owners.only('username', 'email').first()
+    # a file of our own, so that builds running at the same time can't truncate each other's archive
+    fd, zf = tempfile.mkstemp(dir=dest_prefix, suffix='.zip')
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(zf, "w", zipfile.ZIP_DEFLATED, **ZIP_OPTIONS) as zip:
+            write_bag(zip, version, payload, bag_info={
+                'title': resource.title,
+                'author': owner.username,
+                'author_email': owner.email,
+                'version': version,
+                'resource_type': '.'.join((resource._meta.app_label, resource._meta.object_name)),
+                'hydroshare_version': getattr(settings, 'HYDROSHARE_VERSION', "R1 development"),
+                'shortkey': resource.short_id,
+                'slug': resource.slug
+            })
+            _write_dir(zip, version + '/data/visualization')
+        # mkstemp creates the file 0600 and FileSystemStorage keeps that mode when it moves the file into place, unless
+        # FILE_UPLOAD_PERMISSIONS is set
+        os.chmod(zf, _storage_mode())
+
+        b = Bags(content_object=resource, timestamp=resource.updated)
+        with open(zf, 'rb') as fh:
+            bag = _TemporaryFile(fh)
+            bag.DEFAULT_CHUNK_SIZE = CHUNK_SIZE  # remote storage backends copy the upload out through File.chunks()
+            b.bag.save(resource.short_id + '.zip', bag)
+    finally:
+        if os.path.exists(zf):  # local storage will have moved it already
+            os.unlink(zf)
 
-    return b
\ No newline at end of file
+    return b
@@ -1,12 +1,14 @@
 ### resource API
+from collections import OrderedDict
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files import File
 from django.core.files.uploadedfile import UploadedFile
-from mezzanine.generic.models import Keyword, AssignedKeyword
-from dublincore.models import QualifiedDublinCoreElement
-from hs_core.hydroshare.utils import get_resource_types
+from django.db import transaction
+from mezzanine.conf import settings
 from hs_core.models import ResourceFile
 from . import utils
+import os
 
 
 def get_resource(pk):
@@ -45,7 +47,7 @@ def get_resource(pk):
     # 3.F.2. Serialize the resource to disk using TastyPie.
     # 3.F.3. Create a bagit file from the serialized resource.
     # 3.F.4. Return the bagit file
-    return utils.get_resource_by_shortkey(pk).bags.first()
+    return utils.get_resource_by_shortkey(pk, cached=True).bags.first()
 
 
 def get_science_metadata(pk):
@@ -65,7 +67,7 @@ def get_science_metadata(pk):
     Exceptions.NotFound  - The resource identified by pid does not exist
     Exception.ServiceFailure  - The service is unable to process the request
     """
-    return get_system_metadata(pk)
+    return utils.get_resource_by_shortkey(pk, with_related=utils.METADATA_RELATED, cached=True)
 
 
 def get_system_metadata(pk):
@@ -86,7 +88,7 @@ def get_system_metadata(pk):
         Exceptions.NotFound - The resource identified by pid does not exist
         Exception.ServiceFailure - The service is unable to process the request
     """
-    return utils.get_resource_by_shortkey(pk)
+    return utils.get_resource_by_shortkey(pk, with_related=utils.METADATA_RELATED, cached=True)
 
 
 def get_resource_map(pk):
@@ -107,7 +109,7 @@ def get_resource_map(pk):
     Exceptions.NotFound - The resource identified by pid does not exist
     Exception.ServiceFailure - The service is unable to process the request
     """
-    return utils.get_resource_by_shortkey(pk)
+    return utils.get_resource_by_shortkey(pk, with_related=utils.METADATA_RELATED, cached=True)
 
 
 def get_capabilities(pk):
@@ -126,7 +128,7 @@ def get_capabilities(pk):
     Exceptions.NotFound - The resource identified by pid does not exist
     Exception.ServiceFailure - The service is unable to process the request
     """
-    res = utils.get_resource_by_shortkey(pk)
+    res = utils.get_resource_by_shortkey(pk, cached=True)
     return getattr(res, 'extra_capabilities', lambda: None)()
 
 
@@ -149,12 +151,11 @@ def get_resource_file(pk, filename):
     Exceptions.NotFound - The resource identified does not exist or the file identified by filename does not exist
     Exception.ServiceFailure - The service is unable to process the request
     """
-    resource = utils.get_resource_by_shortkey(pk)
-    for f in ResourceFile.objects.filter(content_object=resource):
-        if f.resource_file.name == filename:
-            return f.resource_file
-    else:
+    resource = utils.get_resource_by_shortkey(pk, cached=True)
+    f = resource.files.filter(resource_file=filename).only('id', 'resource_file').first()
+    if f is None:
         raise ObjectDoesNotExist(filename)
+    return f.resource_file
 
 
 def update_resource_file(pk, filename, f):
@@ -178,13 +179,13 @@ def update_resource_file(pk, filename, f):
     Exception.ServiceFailure - The service is unable to process the request
     """
     resource = utils.get_resource_by_shortkey(pk)
-    for rf in ResourceFile.objects.filter(content_object=resource):
-        if rf.resource_file.name == filename:
-            rf.resource_file = File(f) if not isinstance(f, UploadedFile) else f
-            rf.save()
-        return rf
-    else:
+    # not narrowed with only(): saving a new file calls get_path, which needs content_type and object_id
+    rf = resource.files.filter(resource_file=filename).first()
+    if rf is None:
         raise ObjectDoesNotExist(filename)
+    _attach_file(rf, f)
+    rf.save(update_fields=['resource_file'])
+    return rf
 
 def get_revisions(pk):
     """
@@ -204,7 +205,7 @@ def get_revisions(pk):
     Exception.ServiceFailure - The service is unable to process the request
 
     """
-    return utils.get_resource_by_shortkey(pk).bags.all()
+    return utils.get_resource_by_shortkey(pk, cached=True).bags.all()
 
 
 def get_related(pk):
@@ -252,6 +253,107 @@ def get_checksum(pk):
     raise NotImplemented()
 
 
+def _attach_file(rf, f):
+    """
+    Store f as rf's file without saving rf.  The file is handed to the storage backend as is, so it is written out in
+    RESOURCE_FILE_CHUNK_SIZE chunks and uploads Django has spooled to disk are moved into place rather than copied.
+    (Assigning to rf.resource_file instead hides both behind a FieldFile wrapper.)
+    """
+    if not isinstance(f, UploadedFile):
+        f = File(f)
+    f.DEFAULT_CHUNK_SIZE = getattr(settings, 'RESOURCE_FILE_CHUNK_SIZE', 1 << 20)
+    rf.resource_file.save(os.path.basename(f.name), f, save=False)
+    return rf
+
+
+def _add_keywords(resource, ct, keywords, assigned=(), first=0):
+    """
+    Assign keywords (titles) to a resource, creating the ones that don't exist yet.  Existing keywords are fetched
+    with one query and the assignments are written with one INSERT.  ct is the resource's ContentType.
+
+    assigned are titles already assigned to the resource, which are left as they are.  The new assignments are
+    numbered (_order) from first, in the order they are given.
+    """
+    from mezzanine.generic.models import Keyword, AssignedKeyword
+
+    titles = list(OrderedDict.fromkeys(keywords))
+    new = [title for title in titles if title not in assigned]
+    ks = {}
+    if new:
+        for k in Keyword.objects.filter(title__in=new):
+            ks.setdefault(k.title, k)
+    for title in new:
+        if title not in ks:
+            ks[title] = Keyword.objects.create(title=title)  # not bulk_create: Keyword.save() generates the slug
+
+    AssignedKeyword.objects.bulk_create([
+        AssignedKeyword(content_type=ct, object_pk=resource.pk, keyword=ks[title], _order=first + i)
+        for i, title in enumerate(new)
+    ])
+    keywords_string = ' '.join(titles)
+    if getattr(resource, 'keywords_string', keywords_string) != keywords_string:
+        # bulk_create doesn't send the post_save that mezzanine's KeywordsField keeps this search field in sync with,
+        # and whose full save() stamped updated, which versions the resource's bag
+        resource.keywords_string = keywords_string
+        resource.save(update_fields=['keywords_string', 'updated'])
+
+
+def _set_keywords(resource, ct, keywords):
+    """
+    Replace a resource's keywords (titles), only deleting the assignments that are no longer wanted and only adding
+    the ones that are missing.  The assignments that are kept keep their place; the new ones follow them.
+    """
+    from mezzanine.generic.models import AssignedKeyword
+
+    keywords = list(keywords)
+    wanted = set(keywords)
+    current = AssignedKeyword.objects.filter(content_type=ct, object_pk=resource.pk)
+    kept, stale, last = [], False, -1
+    for title, order in current.order_by('_order').values_list('keyword__title', '_order'):
+        if title in wanted:
+            kept.append(title)
+            if order is not None:
+                last = max(last, order)
+        else:
+            stale = True
+    if stale:
+        current.exclude(keyword__title__in=keywords).delete()
+    _add_keywords(resource, ct, kept + keywords, assigned=kept, first=last + 1)
+
+
+def _set_dublin_metadata(resource, ct, dublin_metadata):
+    """
+    Replace a resource's Dublin Core elements, only deleting the ones that are no longer wanted and only adding the
+    ones that are missing.  An element is a dict with term, content and optionally qualifier.
+    """
+    from dublincore.models import QualifiedDublinCoreElement
+
+    current = {}
+    for pk, term, qualifier, content in resource.dublin_metadata.values_list('pk', 'term', 'qualifier', 'content'):
+        current.setdefault((term, qualifier, content), []).append(pk)
+
+    new = []
+    for d in dublin_metadata:
+        kept = current.get((d['term'], d.get('qualifier'), d['content']))
+        if kept:
+            kept.pop()
+        else:
+            new.append(QualifiedDublinCoreElement(
+                term=d['term'],
+                qualifier=d.get('qualifier'),
+                content=d['content'],
+                content_type=ct,
+                object_id=resource.pk
+            ))
+
+    stale = [pk for pks in current.values() for pk in pks]
+    if stale:
+        resource.dublin_metadata.filter(pk__in=stale).delete()
+    if new:
+        QualifiedDublinCoreElement.objects.bulk_create(new)
+
+
+@transaction.atomic
 def create_resource(
         resource_type, owner, title,
         edit_users=None, view_users=None, edit_groups=None, view_groups=None,
@@ -278,12 +380,11 @@ def create_resource(
 
     Note:  The calling user will automatically be set as the owner of the created resource.
     """
-    for tp in get_resource_types():
-        if resource_type == tp.__name__:
-            cls = tp
-            break
-    else:
-        raise NotImplemented("Type {resource_type} does not exist".format(**locals()))
+    from dublincore.models import QualifiedDublinCoreElement
+
+    cls = utils.get_resource_type_map().get(resource_type)
+    if cls is None:
+        raise NotImplementedError("Type {resource_type} does not exist".format(**locals()))
 
     # create the resource
     resource = cls.objects.create(
@@ -292,48 +393,42 @@ def create_resource(
         title=title,
         **kwargs
     )
-    for file in files:
-        ResourceFile.objects.create(content_object=resource, resource_file=file)
+    ct = ContentType.objects.get_for_model(resource)
+    if files:
+        ResourceFile.objects.bulk_create([_attach_file(ResourceFile(content_object=resource), file) for file in files])
 
     resource.view_users.add(owner)
     resource.edit_users.add(owner)
     resource.owners.add(owner)
 
-    if edit_users:   
-        for user in edit_users:
-            user = utils.user_from_id(user)
-            resource.edit_users.add(user)
-            resource.view_users.add(user)
+    if edit_users:
+        edit_users = utils.users_from_ids(edit_users)
+        resource.edit_users.add(*edit_users)
+        resource.view_users.add(*edit_users)
     if view_users:
-        for user in view_users:
-            user = utils.user_from_id(user)
-            resource.view_users.add(user)
+        resource.view_users.add(*utils.users_from_ids(view_users))
     
-    if edit_groups:   
-        for group in edit_groups:
-            group = utils.group_from_id(group)
-            resource.edit_groups.add(group)
-            resource.view_groups.add(group)
+    if edit_groups:
+        edit_groups = utils.groups_from_ids(edit_groups)
+        resource.edit_groups.add(*edit_groups)
+        resource.view_groups.add(*edit_groups)
     if view_groups:
-        for group in view_groups:
-            group = utils.group_from_id(group)
-            resource.view_groups.add(group)
+        resource.view_groups.add(*utils.groups_from_ids(view_groups))
 
     if keywords:
-        ks = [Keyword.objects.get_or_create(k) for k in keywords]
-        ks = zip(*ks)[0]  # ignore whether something was created or not.  zip is its own inverse
-
-        for k in ks:
-            AssignedKeyword.objects.create(content_object=resource, keyword=k)
+        _add_keywords(resource, ct, keywords)
 
     if dublin_metadata:
-        for d in dublin_metadata:
-            QualifiedDublinCoreElement.objects.create(
+        QualifiedDublinCoreElement.objects.bulk_create([
+            QualifiedDublinCoreElement(
                 term=d['term'],
                 qualifier=d.get('qualifier'),
                 content=d['content'],
-                content_object=resource
+                content_type=ct,
+                object_id=resource.pk
             )
+            for d in dublin_metadata
+        ])
 
     return resource
         
@@ -376,68 +471,49 @@ def update_resource(
     systems pick up the changes when filtering on SystmeMetadata.dateSysMetadataModified. A formally published resource
     can only be obsoleted by one newer version. Once a resource is obsoleted, no other resources can obsolete it.
     """
-    resource = utils.get_resource_by_shortkey(pk)
+    with transaction.atomic():
+        resource = utils.get_resource_by_shortkey(pk)
+        ct = ContentType.objects.get_for_model(resource)
 
-    if files:
-        ResourceFile.objects.filter(content_object=resource).delete()
-        for file in files:
-            ResourceFile.objects.create(
-                content_object=resource,
-                resource_file=File(file) if not isinstance(file, UploadedFile) else file
-            )
+        if files:
+            resource.files.all().delete()
+            ResourceFile.objects.bulk_create([
+                _attach_file(ResourceFile(content_object=resource), file) for file in files
+            ])
 
-    if 'owner' in kwargs:
-        owner = kwargs['owner']
-        resource.view_users.add(owner)
-        resource.edit_users.add(owner)
-        resource.owners.add(owner)
+        if 'owner' in kwargs:
+            owner = kwargs['owner']
+            resource.view_users.add(owner)
+            resource.edit_users.add(owner)
+            resource.owners.add(owner)
 
-    if edit_users:
-        resource.edit_users.clear()
-        for user in edit_users:
-            user = utils.user_from_id(user)
-            resource.edit_users.add(user)
-            resource.view_users.add(user)
+        if edit_users:
+            edit_users = utils.users_from_ids(edit_users)
+            resource.edit_users = edit_users
+            resource.view_users.add(*edit_users)
 
-    if view_users:
-        resource.view_users.clear()
-        for user in view_users:
-            user = utils.user_from_id(user)
-            resource.view_users.add(user)
+        if view_users:
+            resource.view_users = utils.users_from_ids(view_users)
 
-    if edit_groups:
-        resource.edit_groups.clear()
-        for group in edit_groups:
-            group = utils.group_from_id(group)
-            resource.edit_groups.add(group)
-            resource.view_groups.add(group)
+        if edit_groups:
+            edit_groups = utils.groups_from_ids(edit_groups)
+            resource.edit_groups = edit_groups
+            resource.view_groups.add(*edit_groups)
 
-    if view_groups:
-        resource.edit_groups.clear()
-        for group in view_groups:
-            group = utils.group_from_id(group)
-            resource.view_groups.add(group)
+        if view_groups:
+            resource.view_groups = utils.groups_from_ids(view_groups)
 
-    if keywords:
-        AssignedKeyword.objects.filter(content_object=resource).delete()
-        ks = [Keyword.objects.get_or_create(k) for k in keywords]
-        ks = zip(*ks)[0]  # ignore whether something was created or not.  zip is its own inverse
-
-        for k in ks:
-            AssignedKeyword.objects.create(content_object=resource, keyword=k)
+        if keywords:
+            _set_keywords(resource, ct, keywords)
 
-    if dublin_metadata:
-        QualifiedDublinCoreElement.objects.filter(content_object=resource).delete()
-        for d in dublin_metadata:
-            QualifiedDublinCoreElement.objects.create(
-                term=d['term'],
-                qualifier=d.get('qualifier'),
-                content=d['content'],
-                content_object=resource
-            )
+        if dublin_metadata:
+            _set_dublin_metadata(resource, ct, dublin_metadata)
 
+    # only once the changes are committed, or a concurrent reader could cache the old resource again
+    utils.invalidate_resource_cache(resource.short_id)
     return resource
 
+@transaction.atomic
 def add_resource_files(pk, *files):
     """
     Called by clients to update a resource in HydroShare by adding a single file.
@@ -471,12 +547,8 @@ def add_resource_files(pk, *files):
 
     """
     resource = utils.get_resource_by_shortkey(pk)
-    ret = []
-    for file in files:
-        ret.append(ResourceFile.objects.create(
-            content_object=resource,
-            resource_file=File(file) if not isinstance(file, UploadedFile) else file
-        ))
+    ret = [_attach_file(ResourceFile(content_object=resource), file) for file in files]
+    ResourceFile.objects.bulk_create(ret)
     return ret
 
 def update_system_metadata(pk, **kwargs):
@@ -521,30 +593,29 @@ def update_science_metadata(pk, dublin_metadata=None, keywords=None, **kwargs):
     Once a resource is obsoleted, no other resources can obsolete it.
 
     """
-    resource = utils.get_resource_by_shortkey(pk)
+    with transaction.atomic():
+        resource = utils.get_resource_by_shortkey(pk)
+        ct = ContentType.objects.get_for_model(resource)
 
-    if keywords:
-        AssignedKeyword.objects.filter(content_object=resource).delete()
-        ks = [Keyword.objects.get_or_create(k) for k in keywords]
-        ks = zip(*ks)[0]  # ignore whether something was created or not.  zip is its own inverse
+        if keywords:
+            _set_keywords(resource, ct, keywords)
 
-        for k in ks:
-            AssignedKeyword.objects.create(content_object=resource, keyword=k)
+        if dublin_metadata:
+            _set_dublin_metadata(resource, ct, dublin_metadata)
 
-    if dublin_metadata:
-        QualifiedDublinCoreElement.objects.filter(content_object=resource).delete()
-        for d in dublin_metadata:
-            QualifiedDublinCoreElement.objects.create(
-                term=d['term'],
-                qualifier=d.get('qualifier'),
-                content=d['content'],
-                content_object=resource
-            )
+        if kwargs:
+            for field, value in kwargs.items():
+                setattr(resource, field, value)
+            # save() stamps updated, which versions the resource's bag, and recomputes the fields mezzanine's Page and
+            # Displayable derive from the others; only those and the changed columns are written
+            update_fields = set(kwargs)
+            update_fields.update(f.name for f in resource._meta.fields
+                                 if f.name in ('updated', 'titles', 'slug', 'description'))
+            resource.save(update_fields=update_fields)
 
-    if kwargs:
-        for field, value in kwargs:
-            setattr(resource, field, value)
-        resource.save()
+    # only once the changes are committed, or a concurrent reader could cache the old resource again
+    utils.invalidate_resource_cache(resource.short_id)
+    return resource
 
 def delete_resource(pk):
     """
@@ -572,9 +643,11 @@ def delete_resource(pk):
     Note:  Only HydroShare administrators will be able to delete formally published resour
     """
     utils.get_resource_by_shortkey(pk).delete()
+    utils.invalidate_resource_cache(pk)
     return pk
 
 
+@transaction.atomic
 def delete_resource_file(pk, filename):
     """
     Deletes an individual file from a HydroShare resource. If the file does not exist, the Exceptions.NotFound exception
@@ -607,13 +680,12 @@ def delete_resource_file(pk, filename):
     version. Once a resource is obsoleted, no other resources can obsolete it.
     """
     resource = utils.get_resource_by_shortkey(pk)
-    for f in ResourceFile.objects.filter(content_object=resource):
-        if f.resource_file.name == filename:
-            f.resource_file.delete()
-            f.delete()
-            break
-    else:
+    f = resource.files.filter(resource_file=filename).only('id', 'resource_file').first()
+    if f is None:
         raise ObjectDoesNotExist(filename)
+    # remove the row first so that a failure to delete the stored file rolls it back rather than leaving it dangling
+    f.delete()
+    f.resource_file.delete(save=False)
 
     return filename
 
@@ -639,13 +711,17 @@ def publish_resource(pk):
 
     Note:  This is different than just giving public access to a resource via access control rul
     """
-    resource = utils.get_resource_by_shortkey(pk)
-    resource.published_and_frozen = True
-    resource.frozen = True
-    resource.edit_users = []
-    resource.edit_groups = []
-    resource.save()
+    with transaction.atomic():
+        resource = utils.get_resource_by_shortkey(pk)
+        resource.published_and_frozen = True
+        resource.frozen = True
+        resource.edit_users.clear()
+        resource.edit_groups.clear()
+        # updated is stamped by save() and versions the resource's bag, so it is written along with the flags
+        resource.save(update_fields=['published_and_frozen', 'frozen', 'updated'])
 
+    # only once the changes are committed, or a concurrent reader could cache the old resource again
+    utils.invalidate_resource_cache(resource.short_id)
 
 
 def resolve_doi(doi):
@@ -1,7 +1,7 @@
 from django.core.exceptions import MultipleObjectsReturned
 from django.contrib.auth.models import User, Group
 from hs_core.models import GroupOwnership
-from .utils import get_resource_by_shortkey, user_from_id, group_from_id, get_resource_types
+from .utils import get_resource_by_shortkey, invalidate_resource_cache, user_from_id, group_from_id, get_resource_types
 from django.core import exceptions
 import json
 
@@ -30,6 +30,7 @@ def set_resource_owner(pk, user):
     res = get_resource_by_shortkey(pk)
     res.owners = [user]
     res.save()
+    invalidate_resource_cache(res.short_id)
     return pk
 
 
@@ -88,9 +89,11 @@ def set_access_rules(pk, user=None, group=None, access=None, allow=False):
     if access == DO_NOT_DISTRIBUTE:
         res.do_not_distribute = allow
         res.save()
+        invalidate_resource_cache(res.short_id)
     elif access == PUBLIC:
         res.public = allow
         res.save()
+        invalidate_resource_cache(res.short_id)
     elif access == EDIT:
         if user:
             if allow:
@@ -6,10 +6,18 @@ from django.shortcuts import get_object_or_404
 from hs_core.models import AbstractResource
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth.models import User, Group
-from . import hs_bagit
+from django.core.cache import cache
+from django.db.models import ForeignKey, Q
+from mezzanine.conf import settings
 import importlib
 
 cached_resource_types = None
+cached_resource_type_map = None
+cached_serializers = {}
+
+RESOURCE_CACHE_PREFIX = 'hs_core:resource:'
+# the users the metadata serializers dereference on every resource; cached resources are always stored with them
+METADATA_RELATED = ('user', 'creator', 'last_changed_by')
 
 def get_resource_types():
     global cached_resource_types
@@ -18,6 +26,14 @@ def get_resource_types():
     return cached_resource_types
 
 
+def get_resource_type_map():
+    """The resource types keyed by class name"""
+    global cached_resource_type_map
+    cached_resource_type_map = {tp.__name__: tp for tp in get_resource_types()} if\
+        not cached_resource_type_map else cached_resource_type_map
+    return cached_resource_type_map
+
+
 def get_resource_instance(app, model_name, pk, or_404=True):
     model = get_model(app, model_name)
     if or_404:
@@ -26,18 +42,47 @@ def get_resource_instance(app, model_name, pk, or_404=True):
         return model.objects.get(pk=pk)
 
 
-def get_resource_by_shortkey(shortkey, or_404=True):
+def get_resource_by_shortkey(shortkey, or_404=True, with_related=(), cached=False):
+    """
+    Look up a resource of any type by its short id.
+
+    with_related names relations to load along with the resource: foreign keys are joined in with select_related and
+    anything else (many-to-many and generic relations) is fetched up front with prefetch_related.
+
+    cached=True serves the resource from the cache, where it is kept for RESOURCE_CACHE_TIMEOUT seconds (30 by
+    default).  It is for read-only callers only: anything that modifies the resource should look it up uncached and
+    call invalidate_resource_cache once it is done.  The cache holds one copy of each resource, loaded with
+    METADATA_RELATED; lookups asking for any other relations go to the database.
+    """
+    if cached and set(with_related).issubset(METADATA_RELATED):
+        key = RESOURCE_CACHE_PREFIX + shortkey
+        m = cache.get(key)
+        if m is None:
+            m = get_resource_by_shortkey(shortkey, or_404, METADATA_RELATED)
+            cache.add(key, m, getattr(settings, 'RESOURCE_CACHE_TIMEOUT', 30))
+        return m
+
     models = get_resource_types()
     for model in models:
-        m = model.objects.filter(short_id=shortkey)
-        if m.exists():
-            return m[0]
+        qs = model.objects.filter(short_id=shortkey)
+        if with_related:
+            fks = set(f.name for f in model._meta.fields if isinstance(f, ForeignKey))
+            qs = qs.select_related(*[r for r in with_related if r in fks])\
+                .prefetch_related(*[r for r in with_related if r not in fks])
+        m = qs.first()
+        if m is not None:
+            return m
     if or_404:
         raise Http404(shortkey)
     else:
         raise ObjectDoesNotExist(shortkey)
 
 
+def invalidate_resource_cache(shortkey):
+    """Drop a resource from the cache used by get_resource_by_shortkey(..., cached=True)."""
+    cache.delete(RESOURCE_CACHE_PREFIX + shortkey)
+
+
 def get_resource_by_doi(doi, or_404=True):
     models = get_resource_types()
     for model in models:
@@ -85,6 +130,77 @@ def group_from_id(grp):
     return tgt
 
 
+def _int_ids(ids):
+    ret = []
+    for i in ids:
+        try:
+            ret.append(int(i))
+        except (TypeError, ValueError):
+            pass
+    return ret
+
+
+def users_from_ids(users):
+    """
+    Resolve a list of users the way user_from_id does (by User instance, username, email or pk), but with at most two
+    queries for the whole list.  Raises Http404 if any of them can't be found.
+    """
+    users = list(users)
+    ids = [u for u in users if not isinstance(u, User)]
+    by_name, by_email, by_pk = {}, {}, {}
+    if ids:
+        # username is indexed and is what callers almost always pass; email isn't, so it is only searched for the
+        # ids that aren't usernames
+        by_name = {u.username: u for u in User.objects.filter(username__in=ids)}
+        rest = [i for i in ids if i not in by_name]
+        if rest:
+            query = Q(email__in=rest)
+            pks = _int_ids(rest)
+            if pks:
+                query |= Q(pk__in=pks)
+            for u in User.objects.filter(query):
+                by_email.setdefault(u.email, u)
+                by_pk[u.pk] = u
+
+    ret = []
+    for user in users:
+        if not isinstance(user, User):
+            pk = _int_ids([user])
+            user = by_name.get(user) or by_email.get(user) or (by_pk.get(pk[0]) if pk else None)
+            if user is None:
+                raise Http404('User not found')
+        ret.append(user)
+    return ret
+
+
+def groups_from_ids(groups):
+    """
+    Resolve a list of groups the way group_from_id does (by Group instance, name or pk), but with a single query for
+    the whole list.  Raises Http404 if any of them can't be found.
+    """
+    groups = list(groups)
+    ids = [g for g in groups if not isinstance(g, Group)]
+    by_name, by_pk = {}, {}
+    if ids:
+        query = Q(name__in=ids)
+        pks = _int_ids(ids)
+        if pks:
+            query |= Q(pk__in=pks)
+        for g in Group.objects.filter(query):
+            by_name[g.name] = g
+            by_pk[g.pk] = g
+
+    ret = []
+    for group in groups:
+        if not isinstance(group, Group):
+            pk = _int_ids([group])
+            group = by_name.get(group) or (by_pk.get(pk[0]) if pk else None)
+            if group is None:
+                raise Http404('Group not found')
+        ret.append(group)
+    return ret
+
+
 def serialize_science_metadata(res):
     serializer = get_serializer(res)
     bundle = serializer.build_bundle(obj=res)
@@ -104,13 +220,23 @@ def serialize_resource_map(res):
 
 
 def get_serializer(resource):
-    tastypie_module = resource._meta.app_label + '.api'        # the module name should follow this convention
-    tastypie_name = resource._meta.object_name + 'Resource'    # the classname of the Resource seralizer
-    tastypie_api = importlib.import_module(tastypie_module)    # import the module
-    return getattr(tastypie_api, tastypie_name)()        # make an instance of the tastypie resource
+    key = (resource._meta.app_label, resource._meta.object_name)
+    if key not in cached_serializers:
+        tastypie_module = resource._meta.app_label + '.api'        # the module name should follow this convention
+        tastypie_name = resource._meta.object_name + 'Resource'    # the classname of the Resource seralizer
+        tastypie_api = importlib.import_module(tastypie_module)    # import the module
+        cached_serializers[key] = getattr(tastypie_api, tastypie_name)()  # make an instance of the tastypie resource
+    return cached_serializers[key]
 
 
 def resource_modified(resource, by_user=None):
+    """
+    Record that a resource was changed and queue the creation of its new bag (hs_core.tasks.create_bag).  This needs
+    Celery, and a broker and worker it is configured for.
+    """
+    from hs_core import tasks  # only here, so that the rest of hs_core.hydroshare can be imported without celery
+
     resource.last_changed_by = by_user
     resource.save()
-    hs_bagit.create_bag(resource)
\ No newline at end of file
+    invalidate_resource_cache(resource.short_id)
+    tasks.create_bag.delay(resource.short_id, resource.updated.isoformat())
\ No newline at end of file
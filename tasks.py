@@ -0,0 +1,23 @@
+from celery import shared_task
+
+
+@shared_task(bind=True, max_retries=10, default_retry_delay=3)
+def create_bag(self, short_id, updated=None):
+    """
+    Create a bag for a resource outside of the request cycle.  See hs_core.hydroshare.hs_bagit.create_bag
+
+    The task is queued before the transaction that modified the resource commits, so it may run while the resource
+    still has its previous timestamp.  It is retried until the resource has caught up with updated.
+
+    Parameters:
+    :param short_id: (str) The short id of the resource to create a bag for.
+    :param updated: (str) The ISO 8601 timestamp of the version to bag, resource.updated.isoformat()
+
+    :return: the primary key of the hs_core.models.Bags instance associated with the new bag.
+    """
+    import arrow
+    from hs_core.hydroshare import hs_bagit, utils
+    resource = utils.get_resource_by_shortkey(short_id, or_404=False)
+    if updated is not None and arrow.get(resource.updated) < arrow.get(updated):
+        raise self.retry()
+    return hs_bagit.create_bag(resource).pk
@@ -0,0 +1,72 @@
+from unittest import TestCase
+from hs_core.hydroshare import hs_bagit
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+
+
+class TestHsBagit(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.paths = []
+        for folder, content in (('one', b'first file'), ('two', b'second file, same name')):
+            os.mkdir(os.path.join(self.tmp, folder))
+            path = os.path.join(self.tmp, folder, 'data.csv')
+            with open(path, 'wb') as f:
+                f.write(content)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_payload_names(self):
+        self.assertListEqual(
+            [name for name, _ in hs_bagit._payload_names(self.paths + ['/elsewhere/data.csv', '/x/y.txt'], 'c/')],
+            ['c/data.csv', 'c/data_1.csv', 'c/data_2.csv', 'c/y.txt'],
+            msg='files sharing a basename were not given a numeric suffix'
+        )
+
+    def test_write_bag(self):
+        metadata = u'{"title": "resource"}'
+        payload = [('resourcemetadata.json', None, metadata)]
+        payload.extend((name, path, None) for name, path in hs_bagit._payload_names(self.paths, 'contents/'))
+
+        zf = os.path.join(self.tmp, 'bag.zip')
+        with zipfile.ZipFile(zf, 'w') as zip:
+            hs_bagit.write_bag(zip, 'v1', payload, bag_info={'shortkey': 'abc'})
+
+        with zipfile.ZipFile(zf) as zip:
+            self.assertSetEqual(
+                set(zip.namelist()),
+                set([
+                    'v1/data/resourcemetadata.json',
+                    'v1/data/contents/data.csv',
+                    'v1/data/contents/data_1.csv',
+                    'v1/bagit.txt',
+                    'v1/bag-info.txt',
+                    'v1/manifest-md5.txt',
+                    'v1/tagmanifest-md5.txt',
+                ])
+            )
+            self.assertEqual(zip.read('v1/data/contents/data_1.csv'), b'second file, same name')
+
+            def checksums(name):
+                return dict(reversed(line.split('  ', 1)) for line in zip.read(name).decode('utf-8').splitlines())
+
+            manifest = checksums('v1/manifest-md5.txt')
+            self.assertEqual(len(manifest), 3)
+            for name, checksum in manifest.items():
+                self.assertEqual(hashlib.md5(zip.read('v1/' + name)).hexdigest(), checksum, msg=name)
+
+            tag_manifest = checksums('v1/tagmanifest-md5.txt')
+            self.assertSetEqual(set(tag_manifest), set(['bagit.txt', 'bag-info.txt', 'manifest-md5.txt']))
+            for name, checksum in tag_manifest.items():
+                self.assertEqual(hashlib.md5(zip.read('v1/' + name)).hexdigest(), checksum, msg=name)
+
+            bag_info = dict(line.split(': ', 1) for line in zip.read('v1/bag-info.txt').decode('utf-8').splitlines())
+            octets = len(metadata) + len(b'first file') + len(b'second file, same name')
+            self.assertEqual(bag_info['Payload-Oxum'], '{0}.3'.format(octets))
+            self.assertEqual(bag_info['shortkey'], 'abc')
+            self.assertIn('Bagging-Date', bag_info)
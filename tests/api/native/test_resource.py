@@ -0,0 +1,80 @@
+from unittest import TestCase
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from dublincore.models import QualifiedDublinCoreElement
+from mezzanine.generic.models import AssignedKeyword
+from hs_core.hydroshare import resource
+from hs_core.models import GenericResource
+
+
+class TestResourceAPI(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user1', email='user1@nowhere.com')
+        self.res = GenericResource.objects.create(
+            user=self.user,
+            title='resource',
+            creator=self.user,
+            last_changed_by=self.user
+        )
+        self.ct = ContentType.objects.get_for_model(self.res)
+
+    def tearDown(self):
+        User.objects.all().delete()
+        GenericResource.objects.all().delete()
+        AssignedKeyword.objects.all().delete()
+        QualifiedDublinCoreElement.objects.all().delete()
+
+    def assigned_keywords(self):
+        return list(
+            AssignedKeyword.objects.filter(content_type=self.ct, object_pk=self.res.pk)
+                .order_by('_order')
+                .values_list('pk', 'keyword__title', '_order')
+        )
+
+    def dublin_metadata(self):
+        return sorted(self.res.dublin_metadata.values_list('pk', 'term', 'content'))
+
+    def test_set_keywords(self):
+        resource._add_keywords(self.res, self.ct, ['a', 'b'])
+        (_, _, _), (b_pk, _, _) = self.assigned_keywords()
+
+        resource._set_keywords(self.res, self.ct, ['b', 'c'])
+        assigned = self.assigned_keywords()
+        self.assertListEqual([title for _, title, _ in assigned], ['b', 'c'])
+        self.assertEqual(assigned[0][0], b_pk, msg='kept keyword was reassigned')
+        self.assertEqual(len(set(order for _, _, order in assigned)), 2, msg='keyword order collided')
+        self.assertEqual(self.res.keywords_string, 'b c')
+
+        # nothing changes when the keywords are the same
+        resource._set_keywords(self.res, self.ct, ['b', 'c'])
+        self.assertListEqual(self.assigned_keywords(), assigned)
+
+    def test_set_dublin_metadata(self):
+        QualifiedDublinCoreElement.objects.bulk_create([
+            QualifiedDublinCoreElement(
+                term=term, qualifier=None, content=content, content_type=self.ct, object_id=self.res.pk
+            )
+            for term, content in (('T', 'title'), ('SUB', 'subject'), ('SUB', 'subject'), ('SUB', 'other'))
+        ])
+        before = self.dublin_metadata()
+
+        resource._set_dublin_metadata(self.res, self.ct, [
+            {'term': 'T', 'content': 'title'},
+            {'term': 'SUB', 'content': 'subject'},
+            {'term': 'CR', 'content': 'creator'},
+        ])
+        after = self.dublin_metadata()
+        self.assertListEqual(
+            sorted((term, content) for _, term, content in after),
+            [('CR', 'creator'), ('SUB', 'subject'), ('T', 'title')]
+        )
+        kept = set(pk for pk, _, _ in before) & set(pk for pk, _, _ in after)
+        self.assertEqual(len(kept), 2, msg='unchanged elements were rewritten')
+
+        # nothing changes when the elements are the same
+        resource._set_dublin_metadata(self.res, self.ct, [
+            {'term': 'CR', 'content': 'creator'},
+            {'term': 'T', 'content': 'title'},
+            {'term': 'SUB', 'content': 'subject'},
+        ])
+        self.assertListEqual(self.dublin_metadata(), after)
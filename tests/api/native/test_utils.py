@@ -2,6 +2,7 @@ from unittest import TestCase
 from hs_core.hydroshare import utils
 from hs_core.models import GenericResource
 from django.contrib.auth.models import Group, User
+from django.http import Http404
 
 class TestUtils(TestCase):
     def setUp(self):
@@ -43,6 +44,22 @@ class TestUtils(TestCase):
             utils.get_resource_types(),
             msg="Resource types was more than just [GenericResource] using cached resource types")
 
+    def test_get_resource_type_map(self):
+        self.assertDictEqual(
+            {'GenericResource': GenericResource},
+            utils.get_resource_type_map(),
+            msg="Resource type map was more than just GenericResource")
+
+        # second time gets the cached map
+        self.assertIs(utils.get_resource_type_map(), utils.get_resource_type_map())
+
+    def test_get_serializer(self):
+        serializer = utils.get_serializer(self.res)
+        self.assertEqual(serializer.__class__.__name__, 'GenericResourceResource')
+
+        # second time gets the cached instance
+        self.assertIs(utils.get_serializer(self.res), serializer)
+
     def test_get_resource_instance(self):
         self.assertEqual(
             utils.get_resource_instance('hs_core', 'GenericResource', self.res.pk),
@@ -55,6 +72,34 @@ class TestUtils(TestCase):
             self.res
         )
 
+        self.assertEqual(
+            utils.get_resource_by_shortkey(self.res.short_id, with_related=('creator', 'owners')),
+            self.res,
+            msg='lookup with related objects failed'
+        )
+
+    def test_get_resource_by_shortkey_cached(self):
+        utils.invalidate_resource_cache(self.res.short_id)
+        self.assertEqual(
+            utils.get_resource_by_shortkey(self.res.short_id, cached=True).title,
+            'resource'
+        )
+
+        # changes not made through the API are not seen until the cache is invalidated
+        GenericResource.objects.filter(pk=self.res.pk).update(title='renamed')
+        self.assertEqual(
+            utils.get_resource_by_shortkey(self.res.short_id, cached=True).title,
+            'resource',
+            msg='cached lookup went to the database'
+        )
+
+        utils.invalidate_resource_cache(self.res.short_id)
+        self.assertEqual(
+            utils.get_resource_by_shortkey(self.res.short_id, cached=True).title,
+            'renamed',
+            msg='invalidated lookup was served from the cache'
+        )
+
     def test_get_resource_by_doi(self):
         self.assertEqual(
             utils.get_resource_by_doi('doi1000100010001'),
@@ -93,3 +138,20 @@ class TestUtils(TestCase):
             msg='lookup by group name failed'
         )
 
+    def test_users_from_ids(self):
+        self.assertListEqual(
+            utils.users_from_ids([self.user, 'user1', 'user1@nowhere.com', self.user.pk]),
+            [self.user] * 4,
+            msg='bulk lookup by instance, username, email address and pk failed'
+        )
+
+        self.assertRaises(Http404, utils.users_from_ids, ['user1', 'nobody'])
+
+    def test_groups_from_ids(self):
+        self.assertListEqual(
+            utils.groups_from_ids([self.group, 'group1', self.group.pk]),
+            [self.group] * 3,
+            msg='bulk lookup by instance, group name and pk failed'
+        )
+
+        self.assertRaises(Http404, utils.groups_from_ids, ['group1', 'nogroup'])